@@ -0,0 +1,77 @@
+"""
+Hackathon.py – spiral beam generator demo for the Cadwork Python plug-in.
+
+Creates a helix of square beams in the active Cadwork 3D model. Run this
+script inside Cadwork (e.g. via the Python IDLE plug-in), the same
+environment as mcp_cadworks_bridge.py.
+"""
+
+import math
+import numpy as np
+import cadwork
+import element_controller as ec
+import attribute_controller as ac
+import geometry_controller as gc
+
+# ───────── spiral parameters ──────────────────────────────────────────────────
+RADIUS = 2000.0        # mm, helix radius
+NUM_STEPS = 20         # number of beam segments
+HEIGHT_STEP = 300.0    # mm rise per segment
+ANGLE_STEP = 2.0 * math.pi / NUM_STEPS
+BEAM_WIDTH = 120.0     # mm, square cross-section
+
+
+def spiral_points(radius, num_steps, height_step, angle_step):
+    """Compute all spiral start points and segment unit vectors.
+
+    Pure array math with no Cadwork calls, kept as a separate function so
+    the whole generation stage runs at C speed inside NumPy (and could be
+    compiled further if a build step ever becomes worthwhile).
+
+    Returns (xs, ys, zs, vxs, vys, vz, length) where length is the shared
+    segment length and vz the shared z-component of the unit vectors.
+    """
+    angles = np.arange(num_steps + 1) * angle_step
+    xs = radius * np.cos(angles)
+    ys = radius * np.sin(angles)
+    zs = np.arange(num_steps + 1) * height_step
+
+    dxs = np.diff(xs)
+    dys = np.diff(ys)
+
+    # Every segment of a uniform helix has the same length: the horizontal
+    # chord is 2 * radius * sin(angle_step / 2), so no per-segment sqrt is
+    # needed.
+    chord_xy = 2.0 * radius * math.sin(angle_step / 2.0)
+    length = math.hypot(chord_xy, height_step)
+    inv_len = 1.0 / length
+    return xs, ys, zs, dxs * inv_len, dys * inv_len, height_step * inv_len, length
+
+
+def main():
+    # Precompute all geometry up front; the loop below only builds the
+    # cadwork.point_3d objects and issues the API calls.
+    xs, ys, zs, vxs, vys, vz, LENGTH = spiral_points(RADIUS, NUM_STEPS, HEIGHT_STEP, ANGLE_STEP)
+
+    # The up-vector is identical for all segments, so one shared point_3d
+    # replaces NUM_STEPS allocations.
+    VECTOR_Z = cadwork.point_3d(0., 0., 1.)
+
+    beam_ids = []
+    for i in range(NUM_STEPS):
+        start_point = cadwork.point_3d(xs[i], ys[i], zs[i])
+        vector_x = cadwork.point_3d(vxs[i], vys[i], vz)
+
+        beam_id = ec.create_square_beam_vectors(BEAM_WIDTH, LENGTH, start_point, vector_x, VECTOR_Z)
+        beam_ids.append(beam_id)
+
+    # Name, select and zoom once, after all beams exist: ac.set_name accepts
+    # a list of IDs, so one call replaces NUM_STEPS per-beam transactions.
+    ac.set_name(beam_ids, "SpiralBeam")
+    ec.select_elements(beam_ids)
+    gc.zoom_elements(beam_ids)
+    print(f"Created {len(beam_ids)} spiral beams.")
+
+
+if __name__ == "__main__":
+    main()
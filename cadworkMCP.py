@@ -0,0 +1,90 @@
+"""
+cadworkMCP.py – attribute inspection utility for the Cadwork Python plug-in.
+
+Dumps the standard and user-defined attributes of the currently active
+(selected) elements. Run inside Cadwork (e.g. via the Python IDLE plug-in),
+the same environment as mcp_cadworks_bridge.py.
+"""
+
+import sys
+
+import element_controller as ec
+import attribute_controller as ac
+
+# Standard attribute getters fetched for every element.
+STANDARD_ATTRS = {
+    "name": ac.get_name,
+    "group": ac.get_group,
+    "subgroup": ac.get_subgroup,
+    "comment": ac.get_comment,
+    "material": ac.get_element_material_name,
+}
+
+# Highest user attribute number checked for a configured name.
+MAX_USER_ATTRIBUTE = 100
+
+
+def get_defined_user_attributes() -> dict:
+    """Look up the defined user attribute names once per run, not per element."""
+    defined = {}
+    for number in range(1, MAX_USER_ATTRIBUTE + 1):
+        try:
+            name = ac.get_user_attribute_name(number)
+        except Exception:
+            continue
+        if name:
+            defined[number] = name
+    return defined
+
+
+def collect_element_attributes(element_ids, defined_user_attrs):
+    """Fetch all attributes in a single pre-pass over the elements.
+
+    Returns (std_all, user_all) dicts keyed by element ID, so the print loop
+    below only does local dict lookups instead of API calls.
+    """
+    std_all = {}
+    user_all = {}
+    for eid in element_ids:
+        std = {}
+        for key, getter in STANDARD_ATTRS.items():
+            try:
+                std[key] = getter(eid)
+            except Exception:
+                std[key] = None
+        std_all[eid] = std
+
+        user = {}
+        for number, name in defined_user_attrs.items():
+            try:
+                value = ac.get_user_attribute(eid, number)
+            except Exception:
+                value = None
+            if value:
+                user[f"{name} ({number})"] = value
+        user_all[eid] = user
+    return std_all, user_all
+
+
+def main():
+    element_ids = ec.get_active_identifiable_element_ids()
+    if not element_ids:
+        print("Found 0 active elements.")
+        return
+
+    defined_user_attrs = get_defined_user_attributes()
+    std_all, user_all = collect_element_attributes(element_ids, defined_user_attrs)
+
+    # Build the whole report in memory and write it in one go: one write()
+    # instead of a print call (and flush) per attribute line.
+    out = [f"Found {len(element_ids)} active elements."]
+    for eid in element_ids:
+        out.append(f"Element ID: {eid}")
+        out.extend(f"    {key}: {value}" for key, value in std_all[eid].items())
+        out.extend(f"    {key}: {value}" for key, value in user_all[eid].items())
+    sys.stdout.write("\n".join(out) + "\n")
+    sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
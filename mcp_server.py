@@ -1,17 +1,62 @@
-# cadworkmcp/src/cadworkmcp/server.py
 import os
 import socket
+import struct
 import json
 import asyncio
+import functools
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from contextlib import asynccontextmanager
 from typing import AsyncIterator, Dict, Any, List, Optional
+import numpy as np
 from mcp.server.fastmcp import FastMCP, Context, Image
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# orjson is 2-5x faster than the stdlib json and works directly on bytes,
+# skipping the separate encode/decode pass. Fall back to stdlib json so the
+# server still runs without the optional dependency (same pattern as the
+# bridge side).
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _dumps_bytes(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode('utf-8')
+
+
+def _loads_bytes(raw: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw.decode('utf-8'))
+
+
+def _frame(payload: bytes) -> bytes:
+    """Prefix a payload with the 4-byte big-endian length header."""
+    return struct.pack("!I", len(payload)) + payload
+
+
+# Zero-arg commands are issued repeatedly over a session but always encode to
+# the same bytes, so the framed wire form is computed once at import and each
+# send skips the dict build, JSON dump, and length prefix entirely.
+_PREENCODED_FRAMED: Dict[str, bytes] = {
+    op: _frame(_dumps_bytes({"operation": op, "args": {}}))
+    for op in ("ping", "get_version_info", "get_active_element_ids", "list_defined_user_attributes")
+}
+
+
+@functools.lru_cache(maxsize=256)
+def _encode_command_cached(operation: str, args_key: tuple) -> bytes:
+    """Framed wire bytes for an (operation, args) pair with hashable args.
+
+    Repeated queries with identical scalar arguments (e.g. polling
+    get_element_info for the same element_id) reduce to one cache lookup
+    instead of a dict build, JSON dump, and length-prefix pack per call.
+    """
+    return _frame(_dumps_bytes({"operation": operation, "args": dict(args_key)}))
 
 # Configure logging
 logging.basicConfig(level=logging.INFO,
@@ -20,78 +65,213 @@ logger = logging.getLogger("CadworkMCPServer")
 
 DEFAULT_CADWORK_PORT = 53002
 SOCKET_TIMEOUT = 30.0  # Increased timeout for potentially longer Cadwork operations
+DEFAULT_POOL_SIZE = 4  # Overridable via CW_POOL_SIZE
+SOCKET_BUFFER_SIZE = 4 * 1024 * 1024  # Explicit 4 MiB send/receive buffers
+
+
+@functools.lru_cache(maxsize=1)
+def _bootstrap_config() -> tuple:
+    """Load .env and resolve connection settings once, on first use.
+
+    Importing this module no longer stats/parses .env from disk; the file
+    is read on the first lifespan startup and the parsed settings are
+    memoized for any later lookup.
+    """
+    load_dotenv()
+    host = "127.0.0.1"
+    port = int(os.environ.get("CW_PORT", DEFAULT_CADWORK_PORT))
+    pool_size = int(os.environ.get("CW_POOL_SIZE", DEFAULT_POOL_SIZE))
+    return host, port, pool_size
+
+@dataclass(slots=True)
+class PluginResponse:
+    """Bridge response with status and message pre-extracted.
+
+    Both fields are probed from the decoded dict exactly once; callers
+    branch on slot attribute loads instead of re-hashing "status" and
+    "message" per response. data keeps the full decoded payload that
+    tools hand back to the MCP host unchanged.
+    """
+    status: str
+    message: str
+    data: Dict[str, Any]
+
 
-@dataclass
+@dataclass(slots=True)
 class CadworkConnection:
+    """Pool of persistent asyncio connections to the Cadwork plug-in.
+
+    Connections are opened lazily (up to pool_size) and kept alive in an
+    asyncio.Queue; each command checks a stream out of the pool for its
+    request/response pair, so parallel tool calls each get their own
+    connection instead of interleaving frames on one socket. A stream
+    that errors is discarded and the command is retried once on a fresh
+    connection.
+    """
     host: str
     port: int
+    pool_size: int = DEFAULT_POOL_SIZE
+    _pool: asyncio.Queue = field(default_factory=asyncio.Queue)
+    _created: int = 0
+    _create_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    async def _open_stream(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            # Disable Nagle (small request/response frames must go out
+            # immediately) and keep idle pooled sockets alive.
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            # Large explicit buffers: geometry dumps and batched commands can
+            # run well past the kernel default window, which would otherwise
+            # cap throughput and force extra recv round-trips.
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+            except OSError:
+                pass
+        logger.info("Opened Cadwork plug-in connection (%s/%s pooled) at %s:%s", self._created, self.pool_size, self.host, self.port)
+        return reader, writer
+
+    async def _acquire(self):
+        """Check a stream out of the pool, opening a new one if under capacity."""
+        try:
+            return self._pool.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        async with self._create_lock:
+            if self._created < self.pool_size:
+                self._created += 1
+                try:
+                    return await self._open_stream()
+                except Exception:
+                    self._created -= 1
+                    raise
+        # Pool is at capacity and all streams are busy: wait for one.
+        return await self._pool.get()
 
-    def send_command(self, operation: str, args: Dict[str, Any] = {}) -> Dict[str, Any]:
-        """Open a new socket, send a command, receive the response, and close the socket."""
-        sock = None
-        command = {
-            "operation": operation,
-            "args": args or {}
-        }
+    def _release(self, stream) -> None:
+        self._pool.put_nowait(stream)
+
+    def _discard(self, stream) -> None:
+        """Drop a broken stream; a later _acquire may open a replacement."""
+        _, writer = stream
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(SOCKET_TIMEOUT)
-            sock.connect((self.host, self.port))
-            logger.info(f"[Per-call] Connected to Cadwork plug-in at {self.host}:{self.port}")
-            command_bytes = json.dumps(command).encode('utf-8')
-            sock.sendall(command_bytes)
-            logger.info(f"[Per-call] Command sent ({len(command_bytes)} bytes), waiting for response...")
-            # Receive response (reuse the chunked receive logic)
-            chunks = []
-            while True:
-                chunk = sock.recv(8192)
-                if not chunk:
-                    break
-                chunks.append(chunk)
+            writer.close()
+        except Exception:
+            pass
+        self._created -= 1
+
+    async def close(self) -> None:
+        while True:
+            try:
+                _, writer = self._pool.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+        self._created = 0
+
+    async def send_command(self, operation: str, args: Optional[Dict[str, Any]] = None) -> "PluginResponse":
+        """Send a framed command over a pooled connection and return the parsed response."""
+        if not args and operation in _PREENCODED_FRAMED:
+            framed = _PREENCODED_FRAMED[operation]
+        else:
+            framed = None
+            if args:
+                # Commands whose args are all hashable scalars recur often
+                # (same element_id polled repeatedly); their framed bytes are
+                # memoized. Unhashable values such as coordinate lists raise
+                # TypeError and take the uncached path below.
                 try:
-                    data = b''.join(chunks)
-                    json.loads(data.decode('utf-8'))
-                    break
-                except json.JSONDecodeError:
+                    framed = _encode_command_cached(operation, tuple(sorted(args.items())))
+                except TypeError:
+                    framed = None
+            if framed is None:
+                command = {
+                    "operation": operation,
+                    "args": args if args is not None else {}
+                }
+                framed = _frame(_dumps_bytes(command))
+        data = None
+        # Retry once on connection errors: the pooled stream may have gone
+        # stale (plug-in restart, idle timeout) since it was last used.
+        for attempt in (0, 1):
+            try:
+                stream = await self._acquire()
+            except (ConnectionError, OSError) as e:
+                logger.error("Could not connect to Cadwork plug-in: %s", e)
+                raise ConnectionError(f"Failed to connect to Cadwork plug-in at {self.host}:{self.port}: {e}")
+            reader, writer = stream
+            try:
+                writer.write(framed)
+                await writer.drain()
+                logger.debug("Command sent (%s bytes), waiting for response...", len(framed))
+                # Framed response: 4-byte length header, then the body, parsed once.
+                header = await asyncio.wait_for(reader.readexactly(4), SOCKET_TIMEOUT)
+                response_len = struct.unpack("!I", header)[0]
+                data = await asyncio.wait_for(reader.readexactly(response_len), SOCKET_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.error("Timeout while waiting for response from Cadwork plug-in")
+                self._discard(stream)
+                raise TimeoutError("Timeout waiting for Cadwork plug-in response - check if the plug-in is running and responsive.")
+            except (asyncio.IncompleteReadError, ConnectionError, BrokenPipeError, ConnectionResetError, ConnectionAbortedError, OSError) as e:
+                self._discard(stream)
+                if attempt == 0:
+                    logger.warning("Stale Cadwork connection (%s: %s), reconnecting and retrying once...", type(e).__name__, e)
                     continue
-            if not chunks:
-                raise ConnectionAbortedError("No data received from Cadwork plug-in")
-            data = b''.join(chunks)
-            response = json.loads(data.decode('utf-8'))
-            logger.info(f"[Per-call] Response parsed, status: {response.get('status', 'unknown')}")
-            if response.get("status") == "error":
-                error_message = response.get("message", "Unknown error from Cadwork plug-in")
-                logger.error(f"Cadwork plug-in error: {error_message}")
-                # Do not raise generic Exception here, let the caller handle the error status
-                # raise Exception(error_message)
-            return response
-        except socket.timeout:
-            logger.error("[Per-call] Socket timeout while waiting for response from Cadwork plug-in")
-            raise TimeoutError("Timeout waiting for Cadwork plug-in response - check if the plug-in is running and responsive.")
-        except (ConnectionError, BrokenPipeError, ConnectionResetError, ConnectionAbortedError) as e:
-            logger.error(f"[Per-call] Socket connection error ({type(e).__name__}) with Cadwork plug-in: {e}", exc_info=True)
-            raise ConnectionError(f"Connection to Cadwork plug-in lost: {e}")
-        except json.JSONDecodeError as e:
-            logger.error(f"[Per-call] Invalid JSON response from Cadwork plug-in: {e}", exc_info=True)
-            if 'data' in locals() and data:
-                logger.error(f"Raw response (first 500 bytes): {data[:500]}")
+                logger.error("Socket connection error (%s) with Cadwork plug-in: %s", type(e).__name__, e, exc_info=True)
+                raise ConnectionError(f"Connection to Cadwork plug-in lost: {e}")
+            except Exception as e:
+                logger.error("Unexpected error (%s) communicating with Cadwork plug-in: %s", type(e).__name__, e, exc_info=True)
+                self._discard(stream)
+                raise RuntimeError(f"Communication error with Cadwork plug-in: {e}")
+            else:
+                self._release(stream)
+                break
+        try:
+            response = _loads_bytes(data)
+        except ValueError as e:  # covers both json.JSONDecodeError and orjson.JSONDecodeError
+            logger.error("Invalid JSON response from Cadwork plug-in: %s", e, exc_info=True)
+            if data and logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Raw response (first 500 bytes): %s", data[:500])
             raise ValueError(f"Invalid response format from Cadwork plug-in: {str(e)}")
-        except Exception as e:
-            logger.error(f"[Per-call] Unexpected error ({type(e).__name__}) communicating with Cadwork plug-in: {e}", exc_info=True)
-            raise RuntimeError(f"Communication error with Cadwork plug-in: {e}")
-        finally:
-            if sock:
-                try:
-                    sock.close()
-                    logger.info("[Per-call] Socket closed.")
-                except Exception:
-                    pass
+        pr = PluginResponse(
+            status=response.get("status", "unknown"),
+            message=response.get("message", ""),
+            data=response
+        )
+        logger.debug("Response parsed, status: %s", pr.status)
+        if pr.status == "error":
+            logger.error("Cadwork plug-in error: %s", pr.message or "Unknown error from Cadwork plug-in")
+            # Do not raise generic Exception here, let the caller handle the error status
+        return pr
+
+def _to_xyz(name: str, v: Any) -> List[float]:
+    """Validate an [x, y, z] point and return it as a list of floats.
+
+    Ask-forgiveness style: the happy path is three C-level float() casts
+    with no isinstance or len checks, and any malformed input (wrong
+    length, non-numeric element, not a sequence) surfaces as the same
+    ValueError. For a single point this beats a NumPy round-trip, whose
+    array construction overhead dwarfs three scalar conversions.
+    """
+    try:
+        x, y, z = v
+        return [float(x), float(y), float(z)]
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a list or tuple of 3 numbers [x, y, z]")
 
-# Global connection instance (stateless)
+
+# Global persistent connection instance
 _cadwork_connection: Optional[CadworkConnection] = None
 
 def get_cadwork_connection() -> CadworkConnection:
-    """Always return a CadworkConnection instance (stateless)."""
+    """Return the shared CadworkConnection instance."""
     if _cadwork_connection is None:
         raise ConnectionError("Cadwork connection not configured. Ensure server_lifespan ran.")
     return _cadwork_connection
@@ -99,33 +279,34 @@ def get_cadwork_connection() -> CadworkConnection:
 @asynccontextmanager
 async def server_lifespan(server: FastMCP) -> AsyncIterator[Dict[str, Any]]:
     global _cadwork_connection
-    host = "127.0.0.1"
-    port = int(os.environ.get("CW_PORT", DEFAULT_CADWORK_PORT))
-    logger.info(f"CadworkMCP server starting up. (Per-call connection mode) Plug-in at {host}:{port}...")
-    _cadwork_connection = CadworkConnection(host=host, port=port)
-    # Optionally, do a handshake test here if you want, but don't keep the socket open
+    host, port, pool_size = _bootstrap_config()
+    logger.info("CadworkMCP server starting up. (Pooled connection mode, up to %s sockets) Plug-in at %s:%s...", pool_size, host, port)
+    _cadwork_connection = CadworkConnection(host=host, port=port, pool_size=pool_size)
+    # Handshake also warms up the persistent connection, so the first real
+    # tool call does not pay the connect cost.
     handshake_ok = False
     try:
         # Try handshake
         try:
-            handshake_response = _cadwork_connection.send_command("ping")
-            if handshake_response.get("status") == "ok":
-                logger.info(f"Handshake successful! Plug-in responded: {handshake_response.get('message', '(no message)')}")
+            handshake_response = await _cadwork_connection.send_command("ping")
+            if handshake_response.status == "ok":
+                logger.info("Handshake successful! Plug-in responded: %s", handshake_response.message or '(no message)')
                 handshake_ok = True
             else:
-                logger.warning(f"Handshake failed: Plug-in responded with status '{handshake_response.get('status')}' and message '{handshake_response.get('message', '(no message)')}'")
+                logger.warning("Handshake failed: Plug-in responded with status '%s' and message '%s'", handshake_response.status, handshake_response.message or '(no message)')
         except Exception as hs_err:
-            logger.warning(f"Handshake failed: {hs_err}")
+            logger.warning("Handshake failed: %s", hs_err)
     except Exception as e:
-        logger.error(f"Error during initial handshake attempt to Cadwork plug-in: {str(e)}")
+        logger.error("Error during initial handshake attempt to Cadwork plug-in: %s", str(e))
 
     # Yield only the cadwork status, like the old version
     yield {"cadwork_handshake_ok": handshake_ok}
 
     # --- Cleanup --- #
     logger.info("CadworkMCP server shutting down...")
+    await _cadwork_connection.close()
     _cadwork_connection = None # Clear Cadwork connection info
-    logger.info("Cadwork plug-in connection info cleared.")
+    logger.info("Cadwork plug-in connection closed.")
 
 # Create the MCP server instance
 mcp = FastMCP(
@@ -146,31 +327,31 @@ mcp = FastMCP(
 )
 async def get_cadwork_version_info() -> Dict[str, Any]:
     """Attempts to get version info from the Cadwork socket plug-in."""
-    logger.info("Tool 'get_cadwork_version_info' called.")
+    logger.debug("Tool 'get_cadwork_version_info' called.")
     response = {"status": "error", "message": "Unknown error"}
     try:
         connection = get_cadwork_connection() # Raises ConnectionError if not connected
-        plugin_response = connection.send_command("get_version_info", {})
+        plugin_response = await connection.send_command("get_version_info", {})
 
         # Check the status from the plugin_response itself
-        if plugin_response.get("status") == "ok":
-            logger.info(f"Received version info from plug-in: {plugin_response}")
+        if plugin_response.status == "ok":
+            logger.debug("Received version info from plug-in: %s", plugin_response.data)
         else:
             # The plugin reported an error
-            error_msg = plugin_response.get("message", "Plug-in returned an error status.")
-            logger.error(f"Plug-in reported error for get_version_info: {error_msg}")
+            error_msg = plugin_response.message or "Plug-in returned an error status."
+            logger.error("Plug-in reported error for get_version_info: %s", error_msg)
         # Always return the raw response from the bridge
-        response = plugin_response
+        response = plugin_response.data
 
     except ConnectionError as e:
-        logger.error(f"Connection error in get_cadwork_version_info: {e}")
+        logger.error("Connection error in get_cadwork_version_info: %s", e)
         response["message"] = f"Failed to connect to Cadwork plug-in: {e}"
     except TimeoutError as e:
-         logger.error(f"Timeout error in get_cadwork_version_info: {e}")
+         logger.error("Timeout error in get_cadwork_version_info: %s", e)
          response["message"] = f"Timeout communicating with Cadwork plug-in: {e}"
     except Exception as e:
         # Catch other potential errors from send_command or get_connection
-        logger.error(f"Unexpected error in get_cadwork_version_info: {e}", exc_info=True)
+        logger.error("Unexpected error in get_cadwork_version_info: %s", e, exc_info=True)
         response["message"] = f"An unexpected server error occurred: {e}"
 
     return response
@@ -188,61 +369,148 @@ async def create_beam(
 ) -> dict:
     """Creates a beam in Cadwork via the socket plug-in."""
     # Initial log
-    logger.info(f"Tool 'create_beam' called with p1={p1}, p2={p2}, width={width}, height={height}, p3={p3}")
+    logger.debug("Tool 'create_beam' called with p1=%s, p2=%s, width=%s, height=%s, p3=%s", p1, p2, width, height, p3)
     response = {"status": "error", "message": "Unknown error"}
 
     try:
         # --- Input Validation ---
-        if not isinstance(p1, (list, tuple)) or len(p1) != 3 or not all(isinstance(n, (int, float)) for n in p1):
-            raise ValueError("p1 must be a list or tuple of 3 numbers [x, y, z]")
-        if not isinstance(p2, (list, tuple)) or len(p2) != 3 or not all(isinstance(n, (int, float)) for n in p2):
-            raise ValueError("p2 must be a list or tuple of 3 numbers [x, y, z]")
-        if p3 is not None and (not isinstance(p3, (list, tuple)) or len(p3) != 3 or not all(isinstance(n, (int, float)) for n in p3)):
-            raise ValueError("p3, if provided, must be a list or tuple of 3 numbers [x, y, z]")
-        if not isinstance(width, (int, float)) or width <= 0:
+        # _to_xyz validates and converts each point in one pass.
+        p1_list = _to_xyz("p1", p1)
+        p2_list = _to_xyz("p2", p2)
+        p3_list = _to_xyz("p3", p3) if p3 is not None else None
+        try:
+            width_f = float(width)
+            height_f = float(height)
+        except (TypeError, ValueError):
+            raise ValueError("width and height must be numbers")
+        if width_f <= 0:
              raise ValueError("width must be a positive number")
-        if not isinstance(height, (int, float)) or height <= 0:
+        if height_f <= 0:
              raise ValueError("height must be a positive number")
         # --- End Input Validation ---
 
         connection = get_cadwork_connection()  # Raises ConnectionError if not connected
 
-        # Prepare arguments, ensuring p1/p2/p3 are lists of floats
         args = {
-            "p1": [float(c) for c in p1],
-            "p2": [float(c) for c in p2],
-            "width": float(width),
-            "height": float(height)
+            "p1": p1_list,
+            "p2": p2_list,
+            "width": width_f,
+            "height": height_f
         }
         # Only include p3 if it was provided
-        if p3 is not None:
-            args["p3"] = [float(c) for c in p3]
+        if p3_list is not None:
+            args["p3"] = p3_list
 
         # Log arguments just before sending
-        logger.info(f"Attempting to send 'create_beam' command with args: {args}")
+        logger.debug("Attempting to send 'create_beam' command with args: %s", args)
 
-        plugin_response = connection.send_command("create_beam", args)
+        plugin_response = await connection.send_command("create_beam", args)
 
         # Check response status
-        if plugin_response.get("status") == "ok":
-            logger.info(f"Beam created successfully: {plugin_response}")
+        if plugin_response.status == "ok":
+            logger.debug("Beam created successfully: %s", plugin_response.data)
         else:
-            error_msg = plugin_response.get("message", "Plug-in returned an error status.")
-            logger.error(f"Plug-in reported error for create_beam: {error_msg}")
+            error_msg = plugin_response.message or "Plug-in returned an error status."
+            logger.error("Plug-in reported error for create_beam: %s", error_msg)
         # Return the raw response from the bridge
-        response = plugin_response
+        response = plugin_response.data
 
     except ValueError as ve: # Catch specific validation errors
-        logger.error(f"Input validation error in create_beam: {ve}")
+        logger.error("Input validation error in create_beam: %s", ve)
         response["message"] = str(ve) # Return validation error message
     except ConnectionError as e:
-        logger.error(f"Connection error in create_beam: {e}")
+        logger.error("Connection error in create_beam: %s", e)
+        response["message"] = f"Failed to connect to Cadwork plug-in: {e}"
+    except TimeoutError as e:
+        logger.error("Timeout error in create_beam: %s", e)
+        response["message"] = f"Timeout communicating with Cadwork plug-in: {e}"
+    except Exception as e:
+        logger.error("Unexpected error in create_beam: %s", e, exc_info=True)
+        response["message"] = f"An unexpected server error occurred: {e}"
+
+    return response
+
+@mcp.tool(
+    name="create_beams",
+    description=(
+        "Creates multiple standard rectangular beam elements in the active Cadwork 3D model with a single call. "
+        "Takes a list of beam specifications, each a dictionary with `p1` ([x,y,z]), `p2` ([x,y,z]), `width`, `height`, "
+        "and an optional orientation point `p3` ([x,y,z]). All beams are sent to Cadwork in one command, so creating "
+        "N beams costs one round-trip instead of N. Returns a dictionary with a 'results' list (one entry per beam, "
+        "in input order, each containing the new element's ID or an error message); status is 'ok' when every beam "
+        "was created, or 'partial' with 'created'/'failed' counts when some specs failed."
+    )
+)
+async def create_beams(beams: List[dict]) -> dict:
+    """Creates a batch of beams in Cadwork via one socket round-trip."""
+    logger.debug("Tool 'create_beams' called with %s beam specs.", len(beams) if isinstance(beams, list) else '?')
+    response = {"status": "error", "message": "Unknown error"}
+
+    try:
+        # --- Input Validation ---
+        if not isinstance(beams, list) or not all(isinstance(b, dict) for b in beams):
+            raise ValueError("beams must be a list of beam spec dictionaries")
+        if not beams:
+            logger.debug("Received empty beams list. Returning empty success response.")
+            return {"status": "ok", "results": []}
+
+        # Stack all p1/p2 points into (N, 3) arrays so the whole batch is
+        # validated and converted in two vectorized passes; per-beam work is
+        # limited to the optional p3 and the scalar dimensions.
+        try:
+            p1s = np.ascontiguousarray([b.get("p1") for b in beams], dtype=np.float64)
+            p2s = np.ascontiguousarray([b.get("p2") for b in beams], dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError("Every beam spec needs numeric p1 and p2 points of 3 coordinates [x, y, z]")
+        if p1s.shape != (len(beams), 3) or p2s.shape != (len(beams), 3):
+            raise ValueError("Every beam spec needs numeric p1 and p2 points of 3 coordinates [x, y, z]")
+
+        wire_beams = []
+        for i, beam in enumerate(beams):
+            width = beam.get("width")
+            height = beam.get("height")
+            if not isinstance(width, (int, float)) or width <= 0:
+                raise ValueError(f"Beam {i}: width must be a positive number")
+            if not isinstance(height, (int, float)) or height <= 0:
+                raise ValueError(f"Beam {i}: height must be a positive number")
+            spec = {
+                "p1": p1s[i].tolist(),
+                "p2": p2s[i].tolist(),
+                "width": float(width),
+                "height": float(height)
+            }
+            p3 = beam.get("p3")
+            if p3 is not None:
+                spec["p3"] = _to_xyz(f"Beam {i}: p3", p3)
+            wire_beams.append(spec)
+        # --- End Input Validation ---
+
+        connection = get_cadwork_connection()
+        args = {"beams": wire_beams}
+        logger.debug("Attempting to send 'create_beams' command with %s beams.", len(wire_beams))
+        plugin_response = await connection.send_command("create_beams", args)
+
+        status = plugin_response.status
+        if status == "ok":
+            logger.debug("All %s beams created successfully.", len(wire_beams))
+        elif status == "partial":
+            logger.warning("create_beams partially failed: %s created, %s failed.", plugin_response.data.get('created'), plugin_response.data.get('failed'))
+        else:
+            error_msg = plugin_response.message or "Plug-in returned an error status."
+            logger.error("Plug-in reported error for create_beams: %s", error_msg)
+        response = plugin_response.data
+
+    except ValueError as ve:
+        logger.error("Input validation error in create_beams: %s", ve)
+        response["message"] = str(ve)
+    except ConnectionError as e:
+        logger.error("Connection error in create_beams: %s", e)
         response["message"] = f"Failed to connect to Cadwork plug-in: {e}"
     except TimeoutError as e:
-        logger.error(f"Timeout error in create_beam: {e}")
+        logger.error("Timeout error in create_beams: %s", e)
         response["message"] = f"Timeout communicating with Cadwork plug-in: {e}"
     except Exception as e:
-        logger.error(f"Unexpected error in create_beam: {e}", exc_info=True)
+        logger.error("Unexpected error in create_beams: %s", e, exc_info=True)
         response["message"] = f"An unexpected server error occurred: {e}"
 
     return response
@@ -253,7 +521,7 @@ async def create_beam(
 )
 async def get_element_info(element_id: int) -> dict:
     """Retrieves geometric and attribute information for a given element ID via the socket plug-in."""
-    logger.info(f"Tool 'get_element_info' called with element_id={element_id}")
+    logger.debug("Tool 'get_element_info' called with element_id=%s", element_id)
     response = {"status": "error", "message": "Unknown error"}
 
     try:
@@ -267,30 +535,30 @@ async def get_element_info(element_id: int) -> dict:
         args = {"element_id": element_id}
 
         # Log arguments just before sending
-        logger.info(f"Attempting to send 'get_element_info' command with args: {args}")
+        logger.debug("Attempting to send 'get_element_info' command with args: %s", args)
 
-        plugin_response = connection.send_command("get_element_info", args)
+        plugin_response = await connection.send_command("get_element_info", args)
 
         # Check response status
-        if plugin_response.get("status") == "ok":
-            logger.info(f"Element info retrieved successfully: {plugin_response.get('info')}")
+        if plugin_response.status == "ok":
+            logger.debug("Element info retrieved successfully: %s", plugin_response.data.get('info'))
         else:
-            error_msg = plugin_response.get("message", "Plug-in returned an error status.")
-            logger.error(f"Plug-in reported error for get_element_info: {error_msg}")
+            error_msg = plugin_response.message or "Plug-in returned an error status."
+            logger.error("Plug-in reported error for get_element_info: %s", error_msg)
         # Return the raw response from the bridge
-        response = plugin_response
+        response = plugin_response.data
 
     except ValueError as ve: # Catch specific validation errors
-        logger.error(f"Input validation error in get_element_info: {ve}")
+        logger.error("Input validation error in get_element_info: %s", ve)
         response["message"] = str(ve) # Return validation error message
     except ConnectionError as e:
-        logger.error(f"Connection error in get_element_info: {e}")
+        logger.error("Connection error in get_element_info: %s", e)
         response["message"] = f"Failed to connect to Cadwork plug-in: {e}"
     except TimeoutError as e:
-        logger.error(f"Timeout error in get_element_info: {e}")
+        logger.error("Timeout error in get_element_info: %s", e)
         response["message"] = f"Timeout communicating with Cadwork plug-in: {e}"
     except Exception as e:
-        logger.error(f"Unexpected error in get_element_info: {e}", exc_info=True)
+        logger.error("Unexpected error in get_element_info: %s", e, exc_info=True)
         response["message"] = f"An unexpected server error occurred: {e}"
 
     return response
@@ -301,42 +569,42 @@ async def get_element_info(element_id: int) -> dict:
 )
 async def get_active_element_ids() -> dict:
     """Retrieves a list of active element IDs from the connected Cadwork plug-in."""
-    logger.info("Tool 'get_active_element_ids' called.")
+    logger.debug("Tool 'get_active_element_ids' called.")
     response = {"status": "error", "message": "Unknown error"}
 
     try:
         connection = get_cadwork_connection() # Raises ConnectionError if not connected
 
         # Log arguments just before sending
-        logger.info("Attempting to send 'get_active_element_ids' command.")
+        logger.debug("Attempting to send 'get_active_element_ids' command.")
 
-        plugin_response = connection.send_command("get_active_element_ids", {})
+        plugin_response = await connection.send_command("get_active_element_ids", {})
 
         # Check response status
-        if plugin_response.get("status") == "ok":
+        if plugin_response.status == "ok":
             # Ensure the key matches what the bridge sends on success
-            if "element_ids" in plugin_response:
-                logger.info(f"Active element IDs retrieved successfully: {plugin_response.get('element_ids')}")
+            if "element_ids" in plugin_response.data:
+                logger.debug("Active element IDs retrieved successfully: %s", plugin_response.data.get('element_ids'))
             else:
-                logger.error(f"Plug-in success response for get_active_element_ids missing 'element_ids' key: {plugin_response}")
+                logger.error("Plug-in success response for get_active_element_ids missing 'element_ids' key: %s", plugin_response.data)
                 # Modify response if key is missing but status was ok
                 response["status"] = "error"
                 response["message"] = "Plug-in response missing 'element_ids' key."
                 return response # Return early with error status
         else:
-            error_msg = plugin_response.get("message", "Plug-in returned an error status.")
-            logger.error(f"Plug-in reported error for get_active_element_ids: {error_msg}")
+            error_msg = plugin_response.message or "Plug-in returned an error status."
+            logger.error("Plug-in reported error for get_active_element_ids: %s", error_msg)
         # Return the raw response from the bridge
-        response = plugin_response
+        response = plugin_response.data
 
     except ConnectionError as e:
-        logger.error(f"Connection error in get_active_element_ids: {e}")
+        logger.error("Connection error in get_active_element_ids: %s", e)
         response["message"] = f"Failed to connect to Cadwork plug-in: {e}"
     except TimeoutError as e:
-        logger.error(f"Timeout error in get_active_element_ids: {e}")
+        logger.error("Timeout error in get_active_element_ids: %s", e)
         response["message"] = f"Timeout communicating with Cadwork plug-in: {e}"
     except Exception as e:
-        logger.error(f"Unexpected error in get_active_element_ids: {e}", exc_info=True)
+        logger.error("Unexpected error in get_active_element_ids: %s", e, exc_info=True)
         response["message"] = f"An unexpected server error occurred: {e}"
 
     return response
@@ -355,7 +623,7 @@ async def get_active_element_ids() -> dict:
 )
 async def get_standard_attributes(element_ids: List[int]) -> dict:
     """Retrieves standard attributes for a list of element IDs via the socket plug-in."""
-    logger.info(f"Tool 'get_standard_attributes' called with {len(element_ids)} element IDs.")
+    logger.debug("Tool 'get_standard_attributes' called with %s element IDs.", len(element_ids))
     response = {"status": "error", "message": "Unknown error"}
 
     try:
@@ -367,34 +635,34 @@ async def get_standard_attributes(element_ids: List[int]) -> dict:
         # --- End Input Validation ---
 
         if not element_ids:
-             logger.info("Received empty element_ids list. Returning empty success response.")
+             logger.debug("Received empty element_ids list. Returning empty success response.")
              return {"status": "ok", "attributes_by_id": {}}
 
         connection = get_cadwork_connection()
         args = {"element_ids": element_ids}
-        logger.info(f"Attempting to send 'get_standard_attributes' command with args: {args}")
-        plugin_response = connection.send_command("get_standard_attributes", args)
+        logger.debug("Attempting to send 'get_standard_attributes' command with args: %s", args)
+        plugin_response = await connection.send_command("get_standard_attributes", args)
 
         # Log success or error based on bridge response
-        if plugin_response.get("status") == "ok":
-            count = len(plugin_response.get("attributes_by_id", {}))
-            logger.info(f"Standard attributes retrieved successfully for {count} elements.")
+        if plugin_response.status == "ok":
+            count = len(plugin_response.data.get("attributes_by_id", {}))
+            logger.debug("Standard attributes retrieved successfully for %s elements.", count)
         else:
-            error_msg = plugin_response.get("message", "Plug-in returned an error status.")
-            logger.error(f"Plug-in reported error for get_standard_attributes: {error_msg}")
-        response = plugin_response # Return raw bridge response
+            error_msg = plugin_response.message or "Plug-in returned an error status."
+            logger.error("Plug-in reported error for get_standard_attributes: %s", error_msg)
+        response = plugin_response.data # Return raw bridge response
 
     except ValueError as ve:
-        logger.error(f"Input validation error in get_standard_attributes: {ve}")
+        logger.error("Input validation error in get_standard_attributes: %s", ve)
         response["message"] = str(ve)
     except ConnectionError as e:
-        logger.error(f"Connection error in get_standard_attributes: {e}")
+        logger.error("Connection error in get_standard_attributes: %s", e)
         response["message"] = f"Failed to connect to Cadwork plug-in: {e}"
     except TimeoutError as e:
-        logger.error(f"Timeout error in get_standard_attributes: {e}")
+        logger.error("Timeout error in get_standard_attributes: %s", e)
         response["message"] = f"Timeout communicating with Cadwork plug-in: {e}"
     except Exception as e:
-        logger.error(f"Unexpected error in get_standard_attributes: {e}", exc_info=True)
+        logger.error("Unexpected error in get_standard_attributes: %s", e, exc_info=True)
         response["message"] = f"An unexpected server error occurred: {e}"
 
     return response
@@ -413,7 +681,7 @@ async def get_standard_attributes(element_ids: List[int]) -> dict:
 )
 async def get_user_attributes(element_ids: List[int], attribute_numbers: List[int]) -> dict:
     """Retrieves specific user attributes for a list of elements via the socket plug-in."""
-    logger.info(f"Tool 'get_user_attributes' called for {len(element_ids)} elements and attributes {attribute_numbers}.")
+    logger.debug("Tool 'get_user_attributes' called for %s elements and attributes %s.", len(element_ids), attribute_numbers)
     response = {"status": "error", "message": "Unknown error"}
 
     try:
@@ -429,35 +697,35 @@ async def get_user_attributes(element_ids: List[int], attribute_numbers: List[in
         # --- End Input Validation ---
 
         if not element_ids or not attribute_numbers:
-             logger.info("Received empty element_ids or attribute_numbers list. Returning empty success response.")
+             logger.debug("Received empty element_ids or attribute_numbers list. Returning empty success response.")
              # Return structure should still match success case for consistency
              return {"status": "ok", "user_attributes_by_id": {}}
 
         connection = get_cadwork_connection()
         args = {"element_ids": element_ids, "attribute_numbers": attribute_numbers}
-        logger.info(f"Attempting to send 'get_user_attributes' command with args: {args}")
-        plugin_response = connection.send_command("get_user_attributes", args)
+        logger.debug("Attempting to send 'get_user_attributes' command with args: %s", args)
+        plugin_response = await connection.send_command("get_user_attributes", args)
 
         # Log success or error based on bridge response
-        if plugin_response.get("status") == "ok":
-            count = len(plugin_response.get("user_attributes_by_id", {}))
-            logger.info(f"User attributes retrieved successfully for {count} elements.")
+        if plugin_response.status == "ok":
+            count = len(plugin_response.data.get("user_attributes_by_id", {}))
+            logger.debug("User attributes retrieved successfully for %s elements.", count)
         else:
-            error_msg = plugin_response.get("message", "Plug-in returned an error status.")
-            logger.error(f"Plug-in reported error for get_user_attributes: {error_msg}")
-        response = plugin_response # Return raw bridge response
+            error_msg = plugin_response.message or "Plug-in returned an error status."
+            logger.error("Plug-in reported error for get_user_attributes: %s", error_msg)
+        response = plugin_response.data # Return raw bridge response
 
     except ValueError as ve:
-        logger.error(f"Input validation error in get_user_attributes: {ve}")
+        logger.error("Input validation error in get_user_attributes: %s", ve)
         response["message"] = str(ve)
     except ConnectionError as e:
-        logger.error(f"Connection error in get_user_attributes: {e}")
+        logger.error("Connection error in get_user_attributes: %s", e)
         response["message"] = f"Failed to connect to Cadwork plug-in: {e}"
     except TimeoutError as e:
-        logger.error(f"Timeout error in get_user_attributes: {e}")
+        logger.error("Timeout error in get_user_attributes: %s", e)
         response["message"] = f"Timeout communicating with Cadwork plug-in: {e}"
     except Exception as e:
-        logger.error(f"Unexpected error in get_user_attributes: {e}", exc_info=True)
+        logger.error("Unexpected error in get_user_attributes: %s", e, exc_info=True)
         response["message"] = f"An unexpected server error occurred: {e}"
 
     return response
@@ -475,31 +743,31 @@ async def get_user_attributes(element_ids: List[int], attribute_numbers: List[in
 )
 async def list_defined_user_attributes() -> dict:
     """Retrieves the names of defined user attributes via the socket plug-in."""
-    logger.info("Tool 'list_defined_user_attributes' called.")
+    logger.debug("Tool 'list_defined_user_attributes' called.")
     response = {"status": "error", "message": "Unknown error"}
 
     try:
         connection = get_cadwork_connection()
-        logger.info("Attempting to send 'list_defined_user_attributes' command.")
-        plugin_response = connection.send_command("list_defined_user_attributes", {})
+        logger.debug("Attempting to send 'list_defined_user_attributes' command.")
+        plugin_response = await connection.send_command("list_defined_user_attributes", {})
 
         # Log success or error based on bridge response
-        if plugin_response.get("status") == "ok":
-            count = len(plugin_response.get("defined_attributes", {}))
-            logger.info(f"Defined user attributes listed successfully ({count} found).")
+        if plugin_response.status == "ok":
+            count = len(plugin_response.data.get("defined_attributes", {}))
+            logger.debug("Defined user attributes listed successfully (%s found).", count)
         else:
-            error_msg = plugin_response.get("message", "Plug-in returned an error status.")
-            logger.error(f"Plug-in reported error for list_defined_user_attributes: {error_msg}")
-        response = plugin_response # Return raw bridge response
+            error_msg = plugin_response.message or "Plug-in returned an error status."
+            logger.error("Plug-in reported error for list_defined_user_attributes: %s", error_msg)
+        response = plugin_response.data # Return raw bridge response
 
     except ConnectionError as e:
-        logger.error(f"Connection error in list_defined_user_attributes: {e}")
+        logger.error("Connection error in list_defined_user_attributes: %s", e)
         response["message"] = f"Failed to connect to Cadwork plug-in: {e}"
     except TimeoutError as e:
-        logger.error(f"Timeout error in list_defined_user_attributes: {e}")
+        logger.error("Timeout error in list_defined_user_attributes: %s", e)
         response["message"] = f"Timeout communicating with Cadwork plug-in: {e}"
     except Exception as e:
-        logger.error(f"Unexpected error in list_defined_user_attributes: {e}", exc_info=True)
+        logger.error("Unexpected error in list_defined_user_attributes: %s", e, exc_info=True)
         response["message"] = f"An unexpected server error occurred: {e}"
 
     return response
@@ -516,7 +784,7 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         logger.info("Server stopped by user.")
     except Exception as e:
-        logger.error(f"Server failed to run: {e}", exc_info=True)
+        logger.error("Server failed to run: %s", e, exc_info=True)
         # Potentially exit with error code
         import sys
         sys.exit(1) 
\ No newline at end of file
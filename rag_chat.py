@@ -0,0 +1,599 @@
+"""
+rag_chat.py – RAG chat assistant over the exported Cadwork BIM data.
+
+Companion to the MCP bridge: the cleaned element export
+(bim_timber_clean.jsonl) is loaded into DuckDB for SQL questions and into a
+Chroma vector store for semantic search, and an OpenAI tool-calling loop
+lets you ask about the model in natural language.
+
+Usage:
+    python rag_chat.py                        # interactive chat
+    python rag_chat.py --sql "SELECT ..."     # one-off SQL query
+"""
+
+import argparse
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import pickle
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import duckdb
+import chromadb
+import numpy as np
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, OpenAI, RateLimitError
+from tqdm import tqdm
+
+# orjson parses the export 2-5x faster than stdlib json; fall back to the
+# stdlib when it is not installed (same pattern as the MCP server).
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+load_dotenv()
+
+DATA_PATH = Path("bim_timber_clean.jsonl")
+PARQUET_PATH = Path("bim.parquet")
+DB_PATH = "bim.duckdb"
+RAG_DB_DIR = "rag_db"
+COLLECTION = "bim"
+EMBED_MODEL = "text-embedding-3-small"
+CHAT_MODEL = "gpt-4o-mini"
+# Rows buffered per col.add call during ingestion; one bulk write per batch
+# instead of one embedding request + one Chroma write per row.
+BATCH = 500
+# Strings per embeddings.create request (the API caps input at 2048).
+EMBED_BATCH = 1024
+# Concurrent in-flight embedding requests during the index build.
+EMBED_CONCURRENCY = 8
+
+SYSTEM_PROMPT = (
+    "You are an assistant for a timber BIM model exported from Cadwork. "
+    "You can answer questions two ways: run SQL against the DuckDB table "
+    "'bim' (columns: nombre, grupo, subgrupo, material, longitud_m, "
+    "volumen_m3, comentario) with the sql_query tool, or look up elements "
+    "semantically with the vector_search tool. For coarse statistics "
+    "(counts, totals or averages per material or grupo) prefer the "
+    "pre-aggregated table 'bim_stats' (columns: material, grupo, n, "
+    "volumen_total_m3, longitud_total_m, longitud_media_m; one of "
+    "material/grupo is NULL per row). Prefer SQL for counts, sums and "
+    "filters; prefer vector search for fuzzy descriptions. Answer in the "
+    "language of the question."
+)
+
+
+# ───────── data → sentence ────────────────────────────────────────────────────
+
+def make_sentence(rec: dict) -> str:
+    """Render one exported element as a natural-language sentence for embedding.
+
+    Hot during the index build: each field is looked up once into a local,
+    pieces are plain string concatenations (no f-string re-parsing of the
+    record), and the row is joined exactly once at the end.
+    """
+    nombre = rec.get("nombre")
+    grupo = rec.get("grupo")
+    subgrupo = rec.get("subgrupo")
+    material = rec.get("material")
+    longitud = rec.get("longitud_m")
+    volumen = rec.get("volumen_m3")
+    comentario = rec.get("comentario")
+
+    bits = ["Elemento " + (nombre or "sin nombre")]
+    if grupo:
+        bits.append("del grupo " + grupo)
+    if subgrupo:
+        bits.append("subgrupo " + subgrupo)
+    if material:
+        bits.append("de material " + material)
+    if longitud is not None:
+        bits.append("con longitud %.2f m" % longitud)
+    if volumen is not None:
+        bits.append("y volumen %.2f m3" % volumen)
+    if comentario:
+        bits.append("(comentario: " + comentario + ")")
+    return ", ".join(bits) + "."
+
+
+# ───────── DuckDB side ────────────────────────────────────────────────────────
+
+def ensure_table(con: duckdb.DuckDBPyConnection) -> None:
+    """Create and populate the bim table from the JSONL export if missing.
+
+    The schema is declared up front and the data bulk-loaded with COPY, so
+    DuckDB skips the read_json_auto type-sniffing pass. Indexes are built
+    after the load completes — indexing during import makes every inserted
+    row pay index maintenance.
+    """
+    exists = con.execute(
+        "SELECT count(*) FROM information_schema.tables WHERE table_name = 'bim'"
+    ).fetchone()[0]
+    if not exists:
+        if PARQUET_PATH.exists():
+            # Columnar snapshot left by a previous run: a view over Parquet is
+            # both smaller and faster to scan than re-importing row-wise JSON.
+            con.execute(f"CREATE VIEW bim AS SELECT * FROM read_parquet('{PARQUET_PATH}')")
+        else:
+            con.execute("PRAGMA memory_limit='4GB'")
+            con.execute("BEGIN")
+            con.execute(
+                "CREATE TABLE bim("
+                "nombre VARCHAR, grupo VARCHAR, subgrupo VARCHAR, material VARCHAR, "
+                "longitud_m DOUBLE, volumen_m3 DOUBLE, comentario VARCHAR)"
+            )
+            con.execute(f"COPY bim FROM '{DATA_PATH}' (FORMAT JSON, AUTO_DETECT FALSE)")
+            con.execute("COMMIT")
+            con.execute("CREATE INDEX idx_nombre ON bim(nombre)")
+            con.execute("CREATE INDEX idx_material ON bim(material)")
+            # Snapshot for the next cold start, so the JSONL import never runs twice.
+            con.execute(f"COPY bim TO '{PARQUET_PATH}' (FORMAT PARQUET, COMPRESSION ZSTD)")
+
+    # Pre-aggregated per-material / per-grupo stats: the model's frequent
+    # COUNT/SUM GROUP BY questions become tiny lookups instead of full scans.
+    stats_exists = con.execute(
+        "SELECT count(*) FROM information_schema.tables WHERE table_name = 'bim_stats'"
+    ).fetchone()[0]
+    if not stats_exists:
+        con.execute(
+            "CREATE TABLE bim_stats AS "
+            "SELECT material, grupo, COUNT(*) AS n, "
+            "SUM(volumen_m3) AS volumen_total_m3, "
+            "SUM(longitud_m) AS longitud_total_m, "
+            "AVG(longitud_m) AS longitud_media_m "
+            "FROM bim GROUP BY GROUPING SETS ((material), (grupo))"
+        )
+
+
+# Rows kept in a rendered result; anything beyond this is noise for the model.
+SQL_MAX_ROWS = 500
+
+
+def _run_sql(query: str) -> str:
+    """Execute a SQL query against the bim table and render a markdown table.
+
+    Formats straight from fetchall() instead of going through a pandas
+    DataFrame and df.to_markdown (which pulls in tabulate and allocates
+    per-cell); one join per row, one join overall.
+    """
+    try:
+        cur = get_con().execute(query)
+        cols = [d[0] for d in cur.description]
+        rows = cur.fetchall()
+    except Exception as e:
+        return f"SQL error: {e}"
+    if not rows:
+        return "(no rows)"
+    extra = len(rows) - SQL_MAX_ROWS
+    if extra > 0:
+        rows = rows[:SQL_MAX_ROWS]
+    lines = [
+        "| " + " | ".join(cols) + " |",
+        "| " + " | ".join("---" for _ in cols) + " |",
+    ]
+    lines.extend("| " + " | ".join(map(str, row)) + " |" for row in rows)
+    if extra > 0:
+        lines.append(f"({extra} more rows truncated)")
+    return "\n".join(lines)
+
+
+# Statements that change state must never be served from (or poison) the cache.
+_SQL_MUTATING = re.compile(r"\b(insert|update|delete|create|drop|alter|copy)\b", re.IGNORECASE)
+
+
+# Second cache level keyed on the hash of DuckDB's logical plan: the model
+# often re-emits the same query with different casing, aliases or formatting,
+# which all normalize to one plan. EXPLAIN costs parse+plan but not execute.
+PLAN_CACHE_SIZE = 256
+_plan_cache: OrderedDict = OrderedDict()  # plan hash -> rendered result
+
+
+@functools.lru_cache(maxsize=256)
+def _sql_query_cached(normalized: str) -> str:
+    try:
+        plan = str(get_con().execute("EXPLAIN (FORMAT JSON) " + normalized).fetchone()[1])
+        key = hashlib.sha256(plan.encode("utf-8")).hexdigest()
+    except Exception:
+        # Query does not EXPLAIN cleanly; run it directly and let the
+        # exact-text cache hold the result.
+        return _run_sql(normalized)
+    hit = _plan_cache.get(key)
+    if hit is not None:
+        _plan_cache.move_to_end(key)
+        return hit
+    result = _run_sql(normalized)
+    _plan_cache[key] = result
+    if len(_plan_cache) > PLAN_CACHE_SIZE:
+        _plan_cache.popitem(last=False)
+    return result
+
+
+def sql_query(query: str) -> str:
+    """Run a SQL query, serving repeated identical queries from a cache.
+
+    The model re-issues the same SELECTs across turns; caching on
+    whitespace-normalized text skips DuckDB's parse/plan/execute for hot
+    repeats. Case is preserved in the key — lowercasing would conflate
+    queries that differ only inside string literals.
+    """
+    normalized = re.sub(r"\s+", " ", query.strip())
+    if _SQL_MUTATING.search(normalized):
+        return _run_sql(normalized)
+    return _sql_query_cached(normalized)
+
+
+# ───────── Chroma side ────────────────────────────────────────────────────────
+
+def _embed(texts: list) -> list:
+    """Embed a list of texts, one API call per EMBED_BATCH chunk.
+
+    Explicit batch embedding replaces Chroma's per-row embedding function:
+    a 10k-row build costs ~10 HTTPS round-trips instead of 10k.
+    """
+    out = []
+    for start in range(0, len(texts), EMBED_BATCH):
+        resp = get_openai().embeddings.create(
+            model=EMBED_MODEL, input=texts[start:start + EMBED_BATCH]
+        )
+        out.extend(d.embedding for d in resp.data)
+    return out
+
+
+def _chunk_offsets(path: Path, n: int) -> list:
+    """Split a file into up to n byte ranges aligned on line boundaries."""
+    size = path.stat().st_size
+    if size == 0:
+        return []
+    step = max(1, size // n)
+    offsets = [0]
+    with path.open("rb") as fh:
+        pos = step
+        while pos < size:
+            fh.seek(pos)
+            fh.readline()  # advance to the next newline so lines stay whole
+            cut = fh.tell()
+            if cut >= size:
+                break
+            offsets.append(cut)
+            pos = cut + step
+    offsets.append(size)
+    return list(zip(offsets[:-1], offsets[1:]))
+
+
+def _build_sentences(bounds: tuple) -> tuple:
+    """Worker: parse one byte range of the export into (docs, metas).
+
+    JSON parse + string formatting is the CPU-bound part of the build, so
+    chunks are farmed out to worker processes; the main process assigns
+    sequential ids after reassembling the chunks in order.
+    """
+    start, end = bounds
+    docs, metas = [], []
+    with DATA_PATH.open("rb") as fh:
+        fh.seek(start)
+        for line in fh.read(end - start).splitlines():
+            if not line.strip():
+                continue
+            rec = _loads(line)
+            docs.append(make_sentence(rec))
+            metas.append({"nombre": rec.get("nombre") or "", "material": rec.get("material") or ""})
+    return docs, metas
+
+
+async def _embed_all(batches: list) -> list:
+    """Embed batches concurrently and return all vectors in input order.
+
+    The build is purely I/O-bound, so overlapping up to EMBED_CONCURRENCY
+    HTTPS round-trips gives near-linear speedup up to the rate limit; 429s
+    back off exponentially and retry.
+    """
+    client = AsyncOpenAI()
+    sem = asyncio.Semaphore(EMBED_CONCURRENCY)
+
+    async def one(batch):
+        async with sem:
+            for delay in (1, 2, 4, 8):
+                try:
+                    resp = await client.embeddings.create(model=EMBED_MODEL, input=batch)
+                    return [d.embedding for d in resp.data]
+                except RateLimitError:
+                    await asyncio.sleep(delay)
+            resp = await client.embeddings.create(model=EMBED_MODEL, input=batch)
+            return [d.embedding for d in resp.data]
+
+    results = await asyncio.gather(*(one(b) for b in batches))
+    return [vec for chunk in results for vec in chunk]
+
+
+def ensure_vector(client: chromadb.ClientAPI):
+    """Return the bim collection, building it from the JSONL export if empty.
+
+    The build reads all sentences first, embeds them with concurrent batch
+    requests (_embed_all), then writes to Chroma in BATCH-row col.add calls,
+    so neither the embedding API nor the store is touched per document.
+    """
+    # HNSW parameters tuned for a corpus of this size (~10k sentences): a
+    # denser graph (M=32) keeps recall effectively full while search_ef=40
+    # gives sub-millisecond queries. Changing M requires rebuilding the
+    # collection (delete the rag_db directory).
+    col = client.get_or_create_collection(
+        COLLECTION,
+        metadata={
+            "hnsw:space": "cosine",
+            "hnsw:M": 32,
+            "hnsw:construction_ef": 200,
+            "hnsw:search_ef": 40,
+        },
+    )
+    if col.count() > 0:
+        return col
+
+    bounds = _chunk_offsets(DATA_PATH, os.cpu_count() or 1)
+    docs, metas = [], []
+    with ProcessPoolExecutor() as pool:
+        for chunk_docs, chunk_metas in tqdm(pool.map(_build_sentences, bounds),
+                                            total=len(bounds), desc="Parsing", unit=" chunks"):
+            docs.extend(chunk_docs)
+            metas.extend(chunk_metas)
+    ids = [str(i) for i in range(len(docs))]
+    if not ids:
+        return col
+
+    batches = [docs[start:start + EMBED_BATCH] for start in range(0, len(docs), EMBED_BATCH)]
+    embeddings = asyncio.run(_embed_all(batches))
+    for start in range(0, len(ids), BATCH):
+        end = start + BATCH
+        col.add(ids=ids[start:end], embeddings=embeddings[start:end],
+                documents=docs[start:end], metadatas=metas[start:end])
+    return col
+
+
+# Exact-repeat cache for vector_search: agent loops re-ask identical
+# questions within one session, and each repeat otherwise costs an embedding
+# API call plus a Chroma query. Keyed by SHA-256 of the normalized question,
+# LRU-capped, with a per-entry TTL. The embedding is stored alongside the
+# rendered result so future layers can reuse the vector.
+QUERY_CACHE_SIZE = 1024
+QUERY_CACHE_TTL = 600.0  # seconds
+_query_cache: OrderedDict = OrderedDict()  # key -> (expires, embedding, result)
+
+# Semantic cache: beyond exact repeats, agent loops rephrase near-duplicate
+# questions. Cached question embeddings are kept unit-normalized in one
+# (N, d) float32 matrix, so a new query is one matrix-vector product; a
+# cosine similarity at or above the threshold returns the cached result and
+# skips the HNSW traversal. FIFO-capped.
+SEM_CACHE_SIZE = 512
+SEM_THRESHOLD = 0.9
+_sem_matrix: Optional[np.ndarray] = None
+_sem_results: list = []
+
+
+def vector_search(question: str, k: int = 10) -> str:
+    """Semantic search over the element sentences; returns the top matches."""
+    global _sem_matrix
+    key = hashlib.sha256(" ".join(question.split()).lower().encode("utf-8")).hexdigest()
+    now = time.monotonic()
+    hit = _query_cache.get(key)
+    if hit is not None:
+        if hit[0] > now:
+            _query_cache.move_to_end(key)
+            return hit[2]
+        del _query_cache[key]
+
+    q_vec = _embed([question])[0]
+    q_unit = np.asarray(q_vec, dtype=np.float32)
+    q_unit /= np.linalg.norm(q_unit) or 1.0
+    if _sem_matrix is not None:
+        sims = _sem_matrix @ q_unit
+        best = int(np.argmax(sims))
+        if sims[best] >= SEM_THRESHOLD:
+            return _sem_results[best]
+
+    res = get_vector().query(query_embeddings=[q_vec], n_results=k)
+    docs = res.get("documents", [[]])[0]
+    result = "\n".join(f"- {d}" for d in docs) if docs else "(no matches)"
+
+    _query_cache[key] = (now + QUERY_CACHE_TTL, q_vec, result)
+    if len(_query_cache) > QUERY_CACHE_SIZE:
+        _query_cache.popitem(last=False)
+
+    _sem_results.append(result)
+    row = q_unit[None, :]
+    _sem_matrix = row if _sem_matrix is None else np.vstack((_sem_matrix, row))
+    if len(_sem_results) > SEM_CACHE_SIZE:
+        _sem_results.pop(0)
+        _sem_matrix = _sem_matrix[1:]
+    return result
+
+
+# ───────── chat loop ──────────────────────────────────────────────────────────
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "sql_query",
+            "description": "Run a SQL query against the DuckDB table 'bim' and get a markdown table back.",
+            "parameters": {
+                "type": "object",
+                "properties": {"query": {"type": "string", "description": "SQL query to execute"}},
+                "required": ["query"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "vector_search",
+            "description": "Semantic search over BIM element descriptions.",
+            "parameters": {
+                "type": "object",
+                "properties": {"question": {"type": "string", "description": "Natural-language question"}},
+                "required": ["question"],
+            },
+        },
+    },
+]
+
+TOOL_IMPLS = {
+    "sql_query": lambda args: sql_query(args["query"]),
+    "vector_search": lambda args: vector_search(args["question"]),
+}
+
+# Persistent completion cache: a conversation head that already ran (same
+# messages, same tool schema) returns instantly with zero token cost.
+CHAT_CACHE_PATH = "chat_cache.sqlite"
+CHAT_CACHE_TTL = 24 * 3600.0  # seconds
+_TOOLS_SIG = hashlib.sha256(json.dumps(TOOLS, sort_keys=True).encode("utf-8")).hexdigest()
+_chat_cache_con: Optional[sqlite3.Connection] = None
+
+
+def _chat_cache() -> sqlite3.Connection:
+    global _chat_cache_con
+    if _chat_cache_con is None:
+        _chat_cache_con = sqlite3.connect(CHAT_CACHE_PATH)
+        _chat_cache_con.execute(
+            "CREATE TABLE IF NOT EXISTS chat_cache (key TEXT PRIMARY KEY, created REAL, resp BLOB)"
+        )
+    return _chat_cache_con
+
+
+def cached_chat(messages: list):
+    """chat.completions.create with a 24h disk cache keyed by message history."""
+    key = hashlib.sha256(
+        (json.dumps(messages, sort_keys=True, default=str) + _TOOLS_SIG).encode("utf-8")
+    ).hexdigest()
+    db = _chat_cache()
+    row = db.execute("SELECT created, resp FROM chat_cache WHERE key = ?", (key,)).fetchone()
+    if row and time.time() - row[0] < CHAT_CACHE_TTL:
+        return pickle.loads(row[1])
+    resp = get_openai().chat.completions.create(model=CHAT_MODEL, messages=messages, tools=TOOLS)
+    db.execute(
+        "INSERT OR REPLACE INTO chat_cache VALUES (?, ?, ?)",
+        (key, time.time(), pickle.dumps(resp)),
+    )
+    db.commit()
+    return resp
+
+
+# History entries (beyond the system prompt) whose tool outputs are sent
+# verbatim; older tool results are truncated to a stub.
+HISTORY_KEEP_TAIL = 6
+TOOL_STUB_CHARS = 200
+
+
+def _prune_history(history: list) -> list:
+    """Trim old tool outputs before re-sending the conversation.
+
+    Big sql_query markdown tables dominate token cost but rarely matter
+    after the turn they served. Tool messages outside the last
+    HISTORY_KEEP_TAIL entries are truncated rather than dropped — removing
+    them would orphan the assistant tool_calls they answer, which the API
+    rejects. The stored history itself is never mutated.
+    """
+    cutoff = len(history) - HISTORY_KEEP_TAIL
+    pruned = []
+    for i, m in enumerate(history):
+        content = m.get("content") if isinstance(m, dict) else None
+        if (i < cutoff and isinstance(m, dict) and m.get("role") == "tool"
+                and isinstance(content, str) and len(content) > TOOL_STUB_CHARS):
+            m = {**m, "content": content[:TOOL_STUB_CHARS] + " ... (truncated)"}
+        pruned.append(m)
+    return pruned
+
+
+def chat() -> None:
+    """Interactive tool-calling loop against the chat model."""
+    history = [{"role": "system", "content": SYSTEM_PROMPT}]
+    print("BIM chat ready - empty line to quit.")
+    while True:
+        try:
+            question = input("> ").strip()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if not question:
+            break
+        history.append({"role": "user", "content": question})
+
+        while True:
+            resp = cached_chat(_prune_history(history))
+            msg = resp.choices[0].message
+            if not msg.tool_calls:
+                history.append({"role": "assistant", "content": msg.content})
+                print(msg.content)
+                break
+            history.append(msg.model_dump(exclude_none=True))
+            for call in msg.tool_calls:
+                impl = TOOL_IMPLS.get(call.function.name)
+                args = json.loads(call.function.arguments or "{}")
+                result = impl(args) if impl else f"unknown tool {call.function.name}"
+                history.append({
+                    "role": "tool",
+                    "tool_call_id": call.id,
+                    "content": result,
+                })
+
+
+# Lazily-built singletons: importing the module costs nothing, a --sql run
+# only pays for DuckDB, and the Chroma/OpenAI clients are created on the
+# first call that actually needs them. This also keeps multiprocessing
+# workers that import this module from bootstrapping anything.
+
+@functools.cache
+def get_con() -> duckdb.DuckDBPyConnection:
+    """DuckDB connection with the bim tables ready; created on first use."""
+    con = duckdb.connect(DB_PATH)
+    # All scans (not just the initial import) should use every core.
+    con.execute(f"PRAGMA threads={os.cpu_count()}")
+    ensure_table(con)
+    return con
+
+
+@functools.cache
+def get_openai() -> OpenAI:
+    return OpenAI()
+
+
+@functools.cache
+def get_vector():
+    """Chroma bim collection; first call may build the whole index.
+
+    By default the collection lives in the embedded PersistentClient, which
+    only supports one writer process. Set CHROMA_HTTP_HOST (and optionally
+    CHROMA_HTTP_PORT, default 8000) to talk to a running `chroma run`
+    server instead, so several processes can share the same index over
+    pooled HTTP connections.
+    """
+    http_host = os.getenv("CHROMA_HTTP_HOST")
+    if http_host:
+        client = chromadb.HttpClient(
+            host=http_host, port=int(os.getenv("CHROMA_HTTP_PORT", "8000"))
+        )
+    else:
+        client = chromadb.PersistentClient(path=RAG_DB_DIR)
+    return ensure_vector(client)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="RAG chat over the exported BIM data")
+    parser.add_argument("--sql", help="Run one SQL query against the bim table and exit")
+    opts = parser.parse_args()
+    if opts.sql:
+        print(sql_query(opts.sql))
+        return
+    chat()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+test_client.py – manual smoke tests for the Cadwork MCP bridge.
+
+Talks to the bridge's TCP socket directly (no MCP host needed) over one
+persistent connection, using the same 4-byte length-prefixed JSON framing
+as mcp_server.py, so replies of any size are read exactly and never
+truncated.
+
+Usage:
+    python test_client.py [1|2|3]   # 1=ping, 2=version info, 3=both (default)
+"""
+
+import json
+import socket
+import struct
+import sys
+
+HOST = "127.0.0.1"
+PORT = 53002
+TIMEOUT = 10.0
+
+
+def recv_exact(sock: socket.socket, n: int) -> bytes:
+    """Receive exactly n bytes; raise ConnectionError on EOF."""
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:])
+        if not k:
+            raise ConnectionError(f"Connection closed while expecting {n - got} more bytes")
+        got += k
+    return bytes(buf)
+
+
+def send_cmd(sock: socket.socket, operation: str, args: dict = None) -> dict:
+    """Send one framed command on the shared socket and return the parsed reply."""
+    payload = json.dumps({"operation": operation, "args": args or {}}).encode("utf-8")
+    sock.sendall(struct.pack("!I", len(payload)) + payload)
+    (length,) = struct.unpack("!I", recv_exact(sock, 4))
+    return json.loads(recv_exact(sock, length).decode("utf-8"))
+
+
+def test_ping(sock: socket.socket) -> None:
+    print("ping ->", send_cmd(sock, "ping"))
+
+
+def test_version(sock: socket.socket) -> None:
+    print("get_version_info ->", send_cmd(sock, "get_version_info"))
+
+
+def main() -> None:
+    choice = sys.argv[1] if len(sys.argv) > 1 else "3"
+    # One connection for the whole run: the bridge keeps connections open
+    # between frames, so there is no reason to reconnect per test.
+    with socket.create_connection((HOST, PORT), timeout=TIMEOUT) as sock:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if choice in ("1", "3"):
+            test_ping(sock)
+        if choice in ("2", "3"):
+            test_version(sock)
+
+
+if __name__ == "__main__":
+    main()